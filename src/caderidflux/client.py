@@ -0,0 +1,39 @@
+""" Shares connections to InfluxDB 2.x databases
+
+InfluxQuery and InfluxWriter instances that connect to the same database with
+the same credentials use the same client, and therefore the same HTTP
+connection pool, instead of each opening their own connections.
+"""
+import functools
+
+from influxdb_client import InfluxDBClient
+
+
+# Maximum number of connections kept open by each shared client. Queries
+# beyond this run concurrently would open connections that are then discarded
+_POOL_SIZE = 16
+
+
+@functools.lru_cache(maxsize=16)
+def _get_client(url: str, token: str, organisation: str) -> InfluxDBClient:
+    """Returns a client for the database, shared between instances that
+    connect with the same details so the connection pool is reused
+
+    Keyword Arguments:
+        url (str): URL of database, including port
+
+        token (str): Authorisation token to access database
+
+        organisation (str): Organisation of auth token
+
+    Returns:
+        InfluxDBClient connected to the database
+    """
+    # The pool needs to be large enough for every concurrent split query
+    return InfluxDBClient(
+        url=url,
+        token=token,
+        org=organisation,
+        timeout=15000000,
+        connection_pool_maxsize=_POOL_SIZE,
+    )
@@ -24,14 +24,45 @@ __maintainer__ = "Idris Hayward"
 __email__ = "CaderIdrisGH@outlook.com"
 __status__ = "Beta"
 
-import dateutil.relativedelta as rd
+from concurrent.futures import ThreadPoolExecutor
+import calendar
 import datetime as dt
-from typing import Any, List, Literal, Optional, Union
+import functools
+import itertools
+import logging
+from typing import Callable, List, Literal, Optional, Union
+import warnings
 
-from influxdb_client import InfluxDBClient
+from influxdb_client.client.warnings import MissingPivotFunction
 import numpy as np
 import pandas as pd
 
+from .client import _POOL_SIZE, _get_client
+
+logger = logging.getLogger(__name__)
+
+
+# Number of splits and the length of each split for every time_split option
+# of InfluxQuery.data_query. Only the requested option is evaluated. Lengths
+# given as an int are a number of calendar months.
+_TIME_SPLITS: dict[
+    Optional[str],
+    Callable[[dt.datetime, dt.datetime], tuple[int, Union[dt.timedelta, int]]],
+] = {
+    "hour": lambda s, e: ((e - s) // dt.timedelta(hours=1), dt.timedelta(hours=1)),
+    "day": lambda s, e: ((e - s).days, dt.timedelta(days=1)),
+    "week": lambda s, e: (-(-(e - s).days // 7), dt.timedelta(days=7)),
+    "month": lambda s, e: (
+        ((e.year - s.year) * 12) + (e.month - s.month),
+        1,
+    ),
+    "year": lambda s, e: (e.year - s.year, 12),
+    None: lambda s, e: (
+        1,
+        dt.timedelta(seconds=((e - s).days * 86400) + (e - s).seconds),
+    ),
+}
+
 
 class InfluxQuery:
     """Queries and formats data from InfluxDB 2.x database
@@ -77,12 +108,7 @@ class InfluxQuery:
         else:
             url = ip
 
-        self._client = InfluxDBClient(
-            url=url,
-            token=token,
-            org=organisation,
-            timeout=15000000,
-        )
+        self._client = _get_client(url, token, organisation)
         self.ip = ip
         self.port = port
         self.token = token
@@ -97,22 +123,33 @@ class InfluxQuery:
         Keyword Arguments:
             query (str): Flux query
         """
-        query_return = self._query_api.query(query=query, org=self.organisation)
-        # query_return should only have one table so this just selects the
-        # first one
-        if query_return:
-            measurements = list()
-            datetime = list()
-            for record in query_return[0].records:
-                values = record.values
-                raw_measurement = values["_value"]
-                if raw_measurement is None:
-                    raw_measurement = np.nan
-                measurements.append(raw_measurement)
-                datetime.append(values["_time"])
-            self._measurements = pd.DataFrame(
-                data={"Datetime": datetime, "Values": measurements}
+        # Custom queries are expected to return a single long format table,
+        # so the client's warning about queries without a pivot is expected
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", MissingPivotFunction)
+            query_stream = self._query_api.query_data_frame_stream(
+                query=query, org=self.organisation
+            )
+            # Tables with differing schemas are streamed as separate
+            # dataframes. Only the first table is used so the rest of the
+            # response isn't parsed, closing the stream releases the
+            # connection
+            query_return = next(query_stream, pd.DataFrame())
+            query_stream.close()
+        if not query_return.empty:
+            first_table = query_return["table"] == query_return["table"].iat[0]
+            measurements = (
+                query_return.loc[first_table, ["_time", "_value"]]
+                .rename(columns={"_time": "Datetime", "_value": "Values"})
+                .reset_index(drop=True)
             )
+            # Null values are parsed as None, they are replaced with NaN so
+            # numeric columns (including entirely null ones) are float
+            values = measurements["Values"]
+            measurements["Values"] = values.where(
+                values.notna(), np.nan
+            ).infer_objects()
+            self._measurements = measurements
 
     def data_query(
         self,
@@ -124,100 +161,212 @@ class InfluxQuery:
         groups: Union[list[str], str],
         win_range: str = "1h",
         win_func: str = "mean",
-        bool_filters: dict[str, str] = dict(),
+        bool_filters: dict[str, Union[str, list[str], dict[str, str]]] = dict(),
         range_filters: list[dict[str, Union[str, float, int, bool]]] = list(),
         hour_beginning: bool = False,
         scaling: list[dict[str, Union[str, int, float]]] = list(),
         multiindex: bool = False,
         aggregate: bool = False,
         time_split: Optional[Literal["hour", "day", "week", "month", "year"]] = None,
+        max_concurrency: int = 8,
     ):
-        """ """
-        time_dict: dict[Optional[str], Any] = {
-            "hour": {
-                "Difference": ((end_date - start_date).days * 24)
-                + ((end_date - start_date).seconds // 3600),
-                "Timedelta": dt.timedelta(hours=1),
-            },
-            "day": {
-                "Difference": (end_date - start_date).days,
-                "Timedelta": dt.timedelta(days=1),
-            },
-            "week": {
-                "Difference": int(np.ceil((end_date - start_date).days / 7)),
-                "Timedelta": dt.timedelta(days=7),
-            },
-            "month": {
-                "Difference": ((end_date.year - start_date.year) * 12)
-                + (end_date.month - start_date.month),
-                "Timedelta": rd.relativedelta(months=1),
-            },
-            "year": {
-                "Difference": (end_date.year - start_date.year),
-                "Timedelta": rd.relativedelta(years=1),
-            },
-            None: {
-                "Difference": 1,
-                "Timedelta": dt.timedelta(
-                    seconds=((end_date - start_date).days * 86400)
-                    + (end_date - start_date).seconds
-                ),
-            },
-        }
+        """Queries the InfluxDB database for the specified measurements and
+        adds them to the measurements instance
+
+        Keyword Arguments:
+            bucket (str): Bucket where data is stored
+
+            start_date (datetime): Start of the date range queried
+
+            end_date (datetime): End of the date range queried
+
+            measurement (str): Measurement tag where data is stored
+
+            fields (list, str): Field(s) to query
+
+            groups (list, str): Tag(s) to group measurements by, each
+            combination of tags is returned as a separate column
+
+            win_range (str): Range of aggregate window, use InfluxDB
+            specified ranges e.g 1h for 1 hour (default: "1h")
+
+            win_func (str): Aggregate function e.g mean, median
+            (default: "mean")
+
+            bool_filters (dict): Tag filters. Values are either the tag
+            value(s) to keep, or a dict with "Value" and "Col" keys which
+            nulls the measurements of field "Col" when the tag isn't "Value"
+
+            range_filters (list): Only keep measurements where a field lies in
+            a range. Keys are "Field", "Min", "Max", "Min Equal" and
+            "Max Equal"
+
+            hour_beginning (bool): Aggregate windows are timestamped by their
+            start instead of their end (default: False)
+
+            scaling (list): Scale fields by a slope and offset. Keys are
+            "Field", "Slope", "Offset" and optionally "Start" and "End"
+
+            multiindex (bool): Split column names on "_" in to a MultiIndex
+            (default: False)
+
+            aggregate (bool): Aggregate measurements in to windows of
+            win_range with win_func (default: False)
+
+            time_split (str): Query the date range in hourly, daily, weekly,
+            monthly or yearly chunks instead of all at once (default: None)
+
+            max_concurrency (int): Maximum number of chunks queried at once.
+            Limited to the size of the client's connection pool, 16
+            (default: 8)
+        """
+        if end_date <= start_date:
+            return
         if isinstance(fields, str):
             fields = [fields]
         if isinstance(groups, str):
             groups = [groups]
-        diff: int = time_dict[time_split]["Difference"]
-        for t_split in range(diff):
-            start_t = start_date + (time_dict[time_split]["Timedelta"] * t_split)
-            end_t = start_date + (time_dict[time_split]["Timedelta"] * (t_split + 1))
-            query = CustomFluxQuery(start_t, end_t, bucket, measurement)
-            extra_fields = [
-                fr["Field"] for fr in range_filters if fr["Field"] not in fields
+        diff, time_step = _TIME_SPLITS[time_split](start_date, end_date)
+        field_set = set(fields)
+        extra_fields = [
+            fr["Field"] for fr in range_filters if fr["Field"] not in field_set
+        ]
+        all_fields = fields.copy()
+        all_fields.extend(extra_fields)
+        query = CustomFluxQuery(start_date, end_date, bucket, measurement)
+        query.add_field(all_fields)
+        query.add_groups(groups + ["_field"])
+        for key, value in bool_filters.items():
+            if not isinstance(value, dict):
+                query.add_filter(key, value)
+        for key, value in bool_filters.items():
+            if isinstance(value, dict):
+                query.add_specific_filter(
+                    key=key, value=value.get("Value"), col=value.get("Col")
+                )
+        if range_filters:
+            query.add_filter_range(range_filters, groups)
+        if extra_fields:
+            # Fields only used for range filtering aren't returned
+            query.add_field(fields)
+        if aggregate:
+            query.add_window(win_range, win_func, time_starting=hour_beginning)
+        if len(fields) > 1 or multiindex or len(groups) == 0:
+            query.add_pivot(groups + ["_field"])
+        else:
+            query.add_pivot(groups)
+        query.drop_start_stop()
+        # Only the range differs between splits so the query is generated
+        # once and the range of each split is substituted in to it
+        template = query.as_template()
+        queries = list()
+        if isinstance(time_step, int):
+            split_bounds = [
+                _add_months(start_date, time_step * t_split)
+                for t_split in range(diff + 1)
             ]
-            all_fields = fields.copy()
-            all_fields.extend(extra_fields)
-            query.add_field(all_fields)
-            query.add_groups(groups + ["_field"])
-            for key, value in bool_filters.items():
-                if not isinstance(value, dict):
-                    query.add_filter(key, value)
-            for key, value in bool_filters.items():
-                if isinstance(value, dict):
-                    query.add_specific_filter(
-                        key=key, value=value.get("Value"), col=value.get("Col")
-                    )
-            if range_filters:
-                query.add_filter_range(range_filters, groups)
-            if aggregate:
-                query.add_window(win_range, win_func, time_starting=hour_beginning)
-            if len(fields) > 1 or multiindex or len(groups) == 0:
-                query.add_pivot(groups + ["_field"])
-            else:
-                query.add_pivot(groups)
-            for scale_conf in scaling:
-                query.add_scaling(scale_conf)
-            print(query.return_query())
-            query_return = self._query_api.query_data_frame(
-                query=query.return_query(), org=self.organisation
-            )
-            if not query_return.empty:
-                data: pd.DataFrame = query_return.drop(
-                    ["result", "table", "_start", "_stop"], axis=1
-                ).set_index("_time")
-                data.index = pd.to_datetime(data.index)
-                data = data.drop(extra_fields, axis=1)
-                if len(fields) == 1 and "_field" in data.columns:
-                    data = data.drop(["_field"], axis=1)
-                if multiindex:
-                    m_idx = data.columns.str.split("_", expand=True)
-                    data.columns = m_idx
-                self._measurements = pd.concat([self._measurements, data])
-
-        self._measurements = self._measurements[
-            ~self._measurements.index.duplicated(keep="first")
-        ].sort_index()
+        else:
+            split_bounds = [
+                start_date + (time_step * t_split) for t_split in range(diff + 1)
+            ]
+        # The range isn't always a whole number of splits, so the last split
+        # is shortened or added to end at end_date
+        split_bounds = [bound for bound in split_bounds if bound < end_date]
+        split_bounds.append(end_date)
+        # The stop of each split is the start of the next so every bound is
+        # only converted once. Bounds less than a second apart convert to the
+        # same timestamp, only the first is kept to avoid empty ranges
+        rfc3339_bounds: list[str] = list()
+        for bound in split_bounds:
+            rfc3339_bound = dt_to_rfc3339(bound)
+            if not rfc3339_bounds or rfc3339_bound != rfc3339_bounds[-1]:
+                rfc3339_bounds.append(rfc3339_bound)
+        for start_t, end_t in zip(rfc3339_bounds[:-1], rfc3339_bounds[1:]):
+            split_query = template.format(start=start_t, stop=end_t)
+            logger.debug("Flux query:\n%s", split_query)
+            queries.append(split_query)
+
+        # Splits are independent of each other so they are queried
+        # concurrently, the client's connection pool is thread safe. The
+        # number of concurrent queries is capped so the server isn't
+        # overwhelmed, and so connections aren't opened beyond what the
+        # client's pool can keep for reuse
+        max_workers = max(min(len(queries), max_concurrency, _POOL_SIZE), 1)
+        run_split = functools.partial(
+            self._run_split, single_field=len(fields) == 1, scaling=scaling
+        )
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            split_frames = list(pool.map(run_split, queries))
+
+        frames: list[pd.DataFrame] = [self._measurements]
+        # Splits normally share the same columns, so each set of column labels
+        # only needs splitting in to a MultiIndex once
+        m_idxs: dict[tuple[str, ...], pd.Index] = dict()
+        for data in itertools.chain.from_iterable(split_frames):
+            if multiindex:
+                labels = tuple(data.columns)
+                if labels not in m_idxs:
+                    m_idxs[labels] = data.columns.str.split("_", expand=True)
+                data.columns = m_idxs[labels]
+            frames.append(data)
+
+        # Each frame is already sorted so a stable mergesort only has to merge
+        # the runs, and keeps the earliest frame's row first for duplicates
+        measurements = pd.concat(frames, copy=False).sort_index(kind="mergesort")
+        # Duplicates are adjacent once sorted, so comparing each timestamp to
+        # the previous one finds them without hashing the whole index.
+        # Timestamps are compared as integers so NaT matches itself
+        index = measurements.index
+        if isinstance(index, pd.DatetimeIndex):
+            index_values = index.asi8
+        else:
+            index_values = index.to_numpy()
+        first_of_time = np.ones(index_values.shape[0], dtype=bool)
+        first_of_time[1:] = index_values[1:] != index_values[:-1]
+        self._measurements = measurements[first_of_time]
+
+    def _run_split(
+        self,
+        query: str,
+        single_field: bool,
+        scaling: list[dict[str, Union[str, int, float]]],
+    ) -> list[pd.DataFrame]:
+        """Sends the flux query for a single time split and formats the
+        measurements as they are streamed back
+
+        Keyword Arguments:
+            query (str): Flux query
+
+            single_field (bool): Only one field was queried, the _field
+            column is dropped
+
+            scaling (list): Scaling configs, see _scale_measurements
+
+        Returns:
+            List of DataFrames indexed by timestamp, one for each table
+            schema returned
+        """
+        frames: list[pd.DataFrame] = list()
+        for data in self._query_api.query_data_frame_stream(
+            query=query, org=self.organisation
+        ):
+            if data.empty:
+                continue
+            # result and table are annotations added by the client, they
+            # aren't columns in the flux tables so can't be dropped there.
+            # The streamed dataframe isn't used elsewhere so it is modified in
+            # place, all columns are dropped at once
+            drop_cols = ["result", "table"]
+            if single_field and "_field" in data.columns:
+                drop_cols.append("_field")
+            data.drop(columns=drop_cols, inplace=True)
+            data.set_index("_time", inplace=True)
+            data.index = pd.to_datetime(data.index)
+            # Scaling is cheaper to apply to the returned columns than as
+            # a per row map in the flux query
+            _scale_measurements(data, scaling)
+            frames.append(data)
+        return frames
 
     def return_measurements(self):
         """Returns the measurements downloaded from the database
@@ -248,6 +397,9 @@ class CustomFluxQuery:
     Attributes:
         _query_list (list): List of components of a Flux query
 
+        _cached_query (str): Query string from the last return_query call,
+        cleared whenever the query is added to
+
     Methods:
         add_field: Adds a field (measurand) to the query
 
@@ -278,6 +430,9 @@ class CustomFluxQuery:
         return_query: Returns the query as a string, the query can't be
         accessed outside of the class
 
+        as_template: Returns the query as a string with placeholders for the
+        start and stop of the range
+
 
     """
 
@@ -297,12 +452,27 @@ class CustomFluxQuery:
             'import "internal/debug"',
             'import "experimental"',
             f'from(bucket: "{bucket}")',
-            f"  |> range(start: {dt_to_rfc3339(start)}, "
-            f"stop: {dt_to_rfc3339(end)})",
-            f"  |> filter(fn: (r) => r._measurement == " f'"{measurement}")',
         ]
+        self._range_index = len(self._query_list)
+        self._query_list.extend(
+            [
+                f"  |> range(start: {dt_to_rfc3339(start)}, "
+                f"stop: {dt_to_rfc3339(end)})",
+                f"  |> filter(fn: (r) => r._measurement == " f'"{measurement}")',
+            ]
+        )
         self._start = start
         self._end = end
+        self._cached_query: Optional[str] = None
+
+    def _add_line(self, line):
+        """Adds a line to the query, clearing the cached query string
+
+        Keyword Arguments:
+            line (str): Line of flux query
+        """
+        self._query_list.append(line)
+        self._cached_query = None
 
     def add_field(self, fields: Union[list[str], str]):
         """Adds a field to the query
@@ -315,7 +485,7 @@ class CustomFluxQuery:
         join_str = '" or r["_field"] == "'
         if isinstance(fields, str):
             fields = [fields]
-        self._query_list.append(
+        self._add_line(
             f'  |> filter(fn: (r) => r["_field"] == ' f'"{join_str.join(fields)}")'
         )
 
@@ -325,13 +495,21 @@ class CustomFluxQuery:
         Keyword Arguments:
             key (str): Key of the tag you want to isolate
 
-            value (str): Tag you want to isolate
+            value (str, list): Tag(s) you want to isolate
         """
-        self._query_list.append(f'  |> filter(fn: (r) => r["{key}"] == "{value}")')
+        # Equality checks joined by or are pushed down to the storage engine,
+        # contains() is not
+        join_str = f'" or r["{key}"] == "'
+        if not isinstance(value, list):
+            value = [value]
+        self._add_line(
+            f'  |> filter(fn: (r) => r["{key}"] == '
+            f'"{join_str.join(map(str, value))}")'
+        )
 
     def add_specific_filter(self, key, value, col):
         """ """
-        self._query_list.append(
+        self._add_line(
             f'  |> map(fn: (r) => ({{ r with "_value": if '
             f'r["{key}"] == "{value}" or r["_field"] != "{col}"'
             f' then r["_value"]'
@@ -356,11 +534,11 @@ class CustomFluxQuery:
             max = filter_field["Max"]
             min_equals_sign = "=" if filter_field["Min Equal"] else ""
             max_equals_sign = "=" if filter_field["Max Equal"] else ""
-            self._query_list.append(
+            self._add_line(
                 f'  |> filter(fn: (r) => r["{name}"] >{min_equals_sign}'
                 f' {min} and r["{name}"] <{max_equals_sign} {max})'
             )
-        self._query_list.append("  |> experimental.unpivot()")
+        self._add_line("  |> experimental.unpivot()")
 
     def add_groups(self, groups):
         """Adds group tag to query
@@ -369,12 +547,12 @@ class CustomFluxQuery:
             group list[str]: Key to group measurements by
         """
         formatted_groups = '", "'.join(groups)
-        self._query_list.append(f'  |> group(columns: ["{formatted_groups}"])')
+        self._add_line(f'  |> group(columns: ["{formatted_groups}"])')
 
     def add_pivot(self, groups):
         """ """
         formatted_groups = '", "'.join(groups)
-        self._query_list.append(
+        self._add_line(
             f'  |> pivot(rowKey: ["_time"], '
             f'columnKey: ["{formatted_groups}"], valueColumn: "_value")'
         )
@@ -401,7 +579,7 @@ class CustomFluxQuery:
         time_source = "_stop"
         if time_starting:
             time_source = "_start"
-        self._query_list.append(
+        self._add_line(
             f"  |> aggregateWindow(every: {range}, "
             f'fn: {function}, column: "{column}", timeSrc: '
             f'"{time_source}", timeDst: "_time", createEmpty: '
@@ -413,19 +591,19 @@ class CustomFluxQuery:
         Drop unneeded columns
         """
         formatted_cols = '", "'.join(cols)
-        self._query_list.append(f'  |> group(columns: ["{formatted_cols}"])')
+        self._add_line(f'  |> group(columns: ["{formatted_cols}"])')
 
     def keep_measurements(self):
         """Removes all columns except _time and _value, can help download
         time
         """
-        self._query_list.append('  |> keep(columns: ["_time", "_value"])')
+        self._add_line('  |> keep(columns: ["_time", "_value"])')
 
     def drop_start_stop(self):
         """Adds drop function which removes superfluous start and stop
         columns
         """
-        self._query_list.append('  |> drop(columns: ["_start", "_stop"])')
+        self._add_line('  |> drop(columns: ["_start", "_stop"])')
 
     def add_scaling(self, scale_conf):
         """ """
@@ -442,7 +620,7 @@ class CustomFluxQuery:
             end = dt_to_rfc3339(end)
         slope = scale_conf.get("Slope", 1)
         offset = scale_conf.get("Offset", 0)
-        self._query_list.append(
+        self._add_line(
             f'  |> map(fn: (r) => ({{ r with "{name}": if '
             f'r["_time"] >= {start} and r["_time"] <= '
             f'{end} then (r["{name}"] * float(v: {slope})) + float(v: {offset})'
@@ -456,7 +634,7 @@ class CustomFluxQuery:
             name (str): Name for data, should be unique if multiple queries are
             made
         """
-        self._query_list.append(f'  |> yield(name: "{name}")')
+        self._add_line(f'  |> yield(name: "{name}")')
 
     def return_query(self):
         """Returns the query string
@@ -464,7 +642,25 @@ class CustomFluxQuery:
         Returns:
             String corresponding to a flux query
         """
-        return "\n".join(self._query_list)
+        if self._cached_query is None:
+            self._cached_query = "\n".join(self._query_list)
+        return self._cached_query
+
+    def as_template(self):
+        """Returns the query string with the range left as placeholders
+
+        The start and stop of the range are replaced with {start} and {stop}
+        so the same query can be reused for multiple time ranges with
+        str.format. All other braces in the query are escaped.
+
+        Returns:
+            String corresponding to a flux query template
+        """
+        query_list = [
+            line.replace("{", "{{").replace("}", "}}") for line in self._query_list
+        ]
+        query_list[self._range_index] = "  |> range(start: {start}, stop: {stop})"
+        return "\n".join(query_list)
 
 
 def dt_to_rfc3339(input, use_time=True):
@@ -479,5 +675,85 @@ def dt_to_rfc3339(input, use_time=True):
         RFC3339 string converted from input
     """
     if use_time:
-        return input.strftime("%Y-%m-%dT%H:%M:%SZ")
+        # isoformat is considerably faster than strftime. strftime ignored
+        # the timezone so it is dropped rather than converted
+        if input.tzinfo is not None:
+            input = input.replace(tzinfo=None)
+        return input.isoformat(timespec="seconds") + "Z"
     return input.strftime("%Y-%m-%d")
+
+
+def _add_months(input, months):
+    """Adds calendar months to a datetime
+
+    The day is clamped to the last day of the resulting month if it would
+    otherwise overflow, e.g 31st January + 1 month is 28th/29th February
+
+    Keyword Arguments:
+        input (datetime): Datetime to add months to
+
+        months (int): Number of months to add
+
+    Returns:
+        Datetime with months added
+    """
+    year, month = divmod(input.month - 1 + months, 12)
+    year = input.year + year
+    month = month + 1
+    day = min(input.day, calendar.monthrange(year, month)[1])
+    return input.replace(year=year, month=month, day=day)
+
+
+def _scale_measurements(data, scaling):
+    """Scales measurements within a date range by a slope and offset, in
+    place
+
+    Keyword Arguments:
+        data (DataFrame): Measurements indexed by timestamp
+
+        scaling (list): Scaling configs. Keys are:
+            Field: Column to scale
+            Start: Start of date range, inclusive (default: no limit)
+            End: End of date range, inclusive (default: no limit)
+            Slope: Multiplier (default: 1)
+            Offset: Added after multiplying by slope (default: 0)
+    """
+    # Configs for the same column are applied in order to one array so the
+    # column is only read and written back once
+    field_scaling: dict[str, list[dict[str, Union[str, int, float]]]] = dict()
+    for scale_conf in scaling:
+        field_scaling.setdefault(scale_conf["Field"], list()).append(scale_conf)
+    for name, scale_confs in field_scaling.items():
+        if name not in data.columns:
+            continue
+        values = data[name].to_numpy(dtype=float, copy=True)
+        for scale_conf in scale_confs:
+            mask = np.ones(values.shape[0], dtype=bool)
+            start = scale_conf.get("Start")
+            if start is not None:
+                mask &= data.index >= _to_utc_timestamp(start)
+            end = scale_conf.get("End")
+            if end is not None:
+                mask &= data.index <= _to_utc_timestamp(end)
+            slope = float(scale_conf.get("Slope", 1))
+            offset = float(scale_conf.get("Offset", 0))
+            np.multiply(values, slope, out=values, where=mask)
+            np.add(values, offset, out=values, where=mask)
+        data[name] = values
+
+
+def _to_utc_timestamp(input):
+    """Converts a scaling config date to a UTC timestamp
+
+    Datetimes are treated as UTC, matching dt_to_rfc3339
+
+    Keyword Arguments:
+        input (str, datetime): Date as a datetime or a string in
+        %Y/%m/%d %H:%M:%S format
+
+    Returns:
+        UTC Timestamp
+    """
+    if isinstance(input, str):
+        input = dt.datetime.strptime(input, "%Y/%m/%d %H:%M:%S")
+    return pd.Timestamp(input.replace(tzinfo=None), tz="UTC")
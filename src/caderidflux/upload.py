@@ -2,17 +2,19 @@
 database
 
 Communicates with InfluxDB 2.0 instance, location specified by config
-file and writes data to it synchronously. It accepts data in varying
-formats (TBD, currently only accepts list of jsons)
+file and writes data to it, either synchronously or in batches in the
+background. It accepts data as a list of containers or a DataFrame
 """
 import datetime as dt
 from typing import Dict, List, TypeAlias, TypedDict, Union
 
 import pandas as pd
 
-from influxdb_client import InfluxDBClient, WriteOptions
+from influxdb_client import WriteOptions
 from influxdb_client.client.write_api import SYNCHRONOUS
 
+from .client import _get_client
+
 
 class Container(TypedDict):
     time: dt.datetime
@@ -25,27 +27,66 @@ ListOfContainers: TypeAlias = List[Container]
 
 
 class InfluxWriter:
-    def __init__(self, ip: str, port: str, token: str, organisation: str, bucket: str):
+    def __init__(
+        self,
+        ip: str,
+        port: str,
+        token: str,
+        organisation: str,
+        bucket: str,
+        batching: bool = False,
+    ):
         """Initialises class
 
+        Parameters
+        ----------
+        ip : str
+            IP/URL of database, localhost if on same machine
+        port : str
+            Port for database, empty string if included in ip
+        token : str
+            Authorisation token to access database
+        organisation : str
+            Organisation of auth token
+        bucket : str
+            Bucket to write measurements to
+        batching : bool, optional
+            Buffer writes and send them in batches of up to 5000 points in the
+            background instead of sending every write immediately. Buffered
+            points are only guaranteed to be written once close is called, or
+            the writer is used as a context manager. Write failures in this
+            mode are not raised by the write methods, they are passed to the
+            client's error callback which only logs them. Default is False
         """
         if port != "":
             url = f"{ip}:{port}"
         else:
             url = ip
 
-        self._client = InfluxDBClient(
-            url=url,
-            token=token,
-            org=organisation,
-            timeout=15000000,
-        )
+        self._client = _get_client(url, token, organisation)
         self.ip = ip
         self.port = port
         self.token = token
         self.organisation = organisation
         self.bucket = bucket
-        self.write_client = self._client.write_api(write_options=SYNCHRONOUS)
+        if batching:
+            write_options = WriteOptions(batch_size=5000, flush_interval=10000)
+        else:
+            write_options = SYNCHRONOUS
+        self.write_client = self._client.write_api(write_options=write_options)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Flushes any buffered writes and closes the write client. The
+        connection to the database is shared so is left open
+        """
+        self.write_client.close()
 
     def write_container_list(self, list_of_containers: ListOfContainers):
         """
@@ -71,7 +112,14 @@ class InfluxWriter:
         measurement : str
             Measurement name
         """
-        tag_cols = [col[0] for col in df.items() if col[1].dtype == 'object']
+        # Period and interval dtypes also have kind "O" so the dtypes are
+        # checked directly
+        is_tag = [
+            dtype == object
+            or isinstance(dtype, (pd.StringDtype, pd.CategoricalDtype))
+            for dtype in df.dtypes
+        ]
+        tag_cols = df.columns[is_tag].tolist()
         self.write_client.write(
             self.bucket,
             self.organisation,